@@ -8,11 +8,11 @@ v2.0 — Adds:
 """
 
 import streamlit as st
+import streamlit.components.v1 as components
 import ee
 import folium
-from streamlit_folium import st_folium
 import pandas as pd
-import plotly.graph_objects as go
+import numpy as np
 from datetime import datetime
 import os, json, io, math, tempfile
 from dotenv import load_dotenv
@@ -22,7 +22,8 @@ load_dotenv()
 # ── Utility imports ────────────────────────────────────────────────────────────
 from utils.gee_utils import (
     get_sentinel_composite,
-    compute_mean_ndvi,
+    compute_mean_ndvi_lazy,
+    get_two_year_ndvi_means,
     calculate_ndvi_timeseries,
     get_ndvi_visualization_params,
     create_aoi_from_point
@@ -107,6 +108,12 @@ NEPAL_FOREST_CARBON = {
     }
 }
 
+# ── Calendar labels (indexed by month number, 1–12) ───────────────────────────
+MONTH_NAMES = ("", "January", "February", "March", "April", "May", "June",
+               "July", "August", "September", "October", "November", "December")
+MONTH_SHORT = ("", "Jan", "Feb", "Mar", "Apr", "May", "Jun",
+               "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
 # ── Page config ───────────────────────────────────────────────────────────────
 st.set_page_config(
     page_title="Himalayan Carbon AI — Forest Monitor",
@@ -116,7 +123,10 @@ st.set_page_config(
 )
 
 # ── CSS ───────────────────────────────────────────────────────────────────────
-st.markdown(f"""
+# The stylesheet must be emitted on every rerun, but the string is built once.
+@st.cache_resource(show_spinner=False)
+def _app_css():
+    return f"""
 <style>
   @import url('https://fonts.googleapis.com/css2?family=DM+Serif+Display:ital@0;1&family=DM+Sans:wght@300;400;500;600;700&display=swap');
   html, body, [class*="css"] {{ font-family: 'DM Sans', sans-serif; color: {DARK_GRAY}; }}
@@ -215,55 +225,109 @@ st.markdown(f"""
   .stTabs [aria-selected="true"] {{ color:{DARK_GREEN} !important; border-bottom-color:{DARK_GREEN} !important; }}
   div[data-testid="stExpander"] summary {{ font-weight:600; color:{DARK_GREEN}; }}
 </style>
-""", unsafe_allow_html=True)
+"""
+
+
+st.markdown(_app_css(), unsafe_allow_html=True)
 
 
 # ══════════════════════════════════════════════════════════════════════════════
 # GEE INIT
 # ══════════════════════════════════════════════════════════════════════════════
+# Set EE_HIGH_VOLUME=1 to use Earth Engine's high-volume endpoint. It gives
+# higher throughput for the batched getInfo() requests (mean NDVI, monthly
+# series, multi-year trend); map tile rendering does not benefit.
+EE_HIGH_VOLUME_URL = 'https://earthengine-highvolume.googleapis.com'
+
+
+@st.cache_resource(show_spinner=False)
+def _initialize_ee(project_id, opt_url=None):
+    """Initialise Earth Engine once per process; failures raise and are not cached."""
+    ee.Initialize(project=project_id, opt_url=opt_url)
+    return True
+
+
 def initialize_gee():
     project_id = os.getenv('GEE_PROJECT_ID')
     if not project_id:
         st.error("❌ GEE_PROJECT_ID not found in .env file")
         return False
+    opt_url = EE_HIGH_VOLUME_URL if os.getenv('EE_HIGH_VOLUME') == '1' else None
     try:
-        ee.Initialize(project=project_id)
-        return True
+        return _initialize_ee(project_id, opt_url)
     except Exception as e:
         st.error(f"❌ Earth Engine init failed: {str(e)}")
         st.info("Run `earthengine authenticate` in your terminal first.")
         return False
 
 
+# ══════════════════════════════════════════════════════════════════════════════
+# CACHED GEE QUERIES
+# ══════════════════════════════════════════════════════════════════════════════
+# Results are shared across sessions. ee.Geometry is not hashable by
+# Streamlit, so each helper is keyed on aoi.serialize() and receives the
+# geometry itself as an underscore (unhashed) argument.
+@st.cache_data(ttl=3600, show_spinner=False)
+def cached_ndvi_change(aoi_key, _aoi, year1, year2, start_month, end_month):
+    """Mean NDVI for both years and the % change, fetched in one round-trip."""
+    ee_means = get_two_year_ndvi_means(_aoi, year1, year2, start_month, end_month)
+    ee_mean1, ee_mean2 = ee_means.get(0), ee_means.get(1)
+    # EE's If treats null and 0 as false: change is 0 unless both means exist
+    ee_change = ee.Algorithms.If(ee_mean1, ee.Algorithms.If(
+        ee_mean2,
+        ee.Number(ee_mean2).subtract(ee_mean1).divide(ee_mean1).multiply(100),
+        0
+    ), 0)
+    mean_ndvi1, mean_ndvi2, ndvi_change_pct = ee.List(
+        [ee_mean1, ee_mean2, ee_change]
+    ).getInfo()
+    return mean_ndvi1, mean_ndvi2, float(ndvi_change_pct)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def cached_ndvi_timeseries(aoi_key, _aoi, year, start_month, end_month):
+    return calculate_ndvi_timeseries(_aoi, year, start_month, end_month)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def cached_multiyear_trend(aoi_key, _aoi, start_month, end_month, start_year=2019):
+    return build_multiyear_trend(_aoi, start_month, end_month, start_year=start_year)
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 # FEATURE 3 — MULTI-YEAR NDVI TREND
 # ══════════════════════════════════════════════════════════════════════════════
-def get_annual_ndvi(aoi, year, start_month, end_month):
-    """Compute single mean NDVI for a given year over the season window."""
+def get_annual_ndvi_lazy(aoi, year, start_month, end_month):
+    """Build (without fetching) the mean NDVI for a year's season window."""
     start = f"{year}-{start_month:02d}-01"
     end   = f"{year}-{end_month:02d}-28"
-    try:
-        composite = get_sentinel_composite(aoi, start, end)
-        ndvi = compute_mean_ndvi(composite, aoi)
-        return ndvi
-    except Exception:
-        return None
+    composite = get_sentinel_composite(aoi, start, end, method='median')
+    # A season with no scenes yields a band-less composite: report None instead
+    # of erroring, so genuine EE failures still raise (and are never cached)
+    return ee.Algorithms.If(
+        composite.bandNames().size().gt(0),
+        compute_mean_ndvi_lazy(composite, aoi),
+        None
+    )
 
 
 def build_multiyear_trend(aoi, start_month, end_month, start_year=2019):
     """
     Collect annual mean NDVI from start_year to current year.
     Returns list of {year, ndvi} dicts.
+    All years are fetched in a single getInfo() call; years without scenes
+    are skipped, EE request errors propagate.
     Note: Sentinel-2 SR data is available from 2017 but we default to 2019
     for more reliable data coverage across Nepal.
     """
-    current_year = datetime.now().year
-    results = []
-    for yr in range(start_year, current_year + 1):
-        ndvi = get_annual_ndvi(aoi, yr, start_month, end_month)
-        if ndvi is not None:
-            results.append({"year": yr, "ndvi": round(ndvi, 4)})
-    return results
+    years = list(range(start_year, datetime.now().year + 1))
+    annual = ee.List([
+        get_annual_ndvi_lazy(aoi, yr, start_month, end_month) for yr in years
+    ]).getInfo()
+    return [
+        {"year": yr, "ndvi": round(ndvi, 4)}
+        for yr, ndvi in zip(years, annual) if ndvi is not None
+    ]
 
 
 def create_multiyear_chart(trend_data, location_name, forest_type="default"):
@@ -276,6 +340,8 @@ def create_multiyear_chart(trend_data, location_name, forest_type="default"):
     if not trend_data or len(trend_data) < 2:
         return None
 
+    import plotly.graph_objects as go
+
     df = pd.DataFrame(trend_data)
     years = df['year'].tolist()
     ndvi_vals = df['ndvi'].tolist()
@@ -343,6 +409,39 @@ def create_multiyear_chart(trend_data, location_name, forest_type="default"):
     return fig, slope, trend_direction
 
 
+def create_ndvi_trend_chart(months, ndvi_values, year, location_name):
+    """
+    Plot the monthly NDVI series for a single year.
+    months are 'YYYY-MM' strings and ndvi_values the matching means; both are
+    passed as NumPy arrays straight to the trace (no DataFrame round-trip).
+    """
+    import plotly.graph_objects as go
+
+    months = np.asarray(months, dtype='datetime64[M]')
+    ndvi_values = np.asarray(ndvi_values, dtype=float)
+
+    fig = go.Figure()
+    fig.add_trace(go.Scattergl(
+        x=months, y=ndvi_values,
+        mode='lines+markers',
+        line=dict(color=ACCENT, width=3),
+        marker=dict(size=9, color=DARK_GREEN, line=dict(color=WHITE, width=2)),
+        fill='tozeroy', fillcolor='rgba(64,145,108,0.12)',
+        name='Monthly NDVI'
+    ))
+
+    fig.update_layout(
+        title=dict(text=f"Monthly NDVI ({year}) — {location_name}",
+                   font=dict(size=16, color=DARK_GREEN, family="DM Serif Display")),
+        xaxis_title="Month", yaxis_title="NDVI",
+        xaxis=dict(tickformat='%b %Y'),
+        yaxis=dict(range=[0,1]), plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)', font=dict(family="DM Sans", size=12),
+        margin=dict(l=40, r=20, t=50, b=40)
+    )
+    return fig
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 # FEATURE 4 — CARBON STOCK ESTIMATION
 # ══════════════════════════════════════════════════════════════════════════════
@@ -546,11 +645,6 @@ def build_pdf_report(
     Generate a professional PDF report matching the HCA green color scheme.
     Returns bytes object ready for st.download_button.
     """
-    month_names = {1:"January",2:"February",3:"March",4:"April",5:"May",6:"June",
-                   7:"July",8:"August",9:"September",10:"October",11:"November",12:"December"}
-    month_short = {1:"Jan",2:"Feb",3:"Mar",4:"Apr",5:"May",6:"Jun",
-                   7:"Jul",8:"Aug",9:"Sep",10:"Oct",11:"Nov",12:"Dec"}
-
     buffer = io.BytesIO()
     PAGE_W, PAGE_H = A4
     MARGIN = 20*mm
@@ -686,7 +780,7 @@ def build_pdf_report(
         ["Location", location_name],
         ["Coordinates", f"{lat:.4f}°N, {lon:.4f}°E"],
         ["Analysis Radius", f"{buffer_km} km"],
-        ["Season Window", f"{month_names[start_month]} – {month_names[end_month]}"],
+        ["Season Window", f"{MONTH_NAMES[start_month]} – {MONTH_NAMES[end_month]}"],
         ["Comparison Years", f"{year1} vs {year2}"],
         ["Satellite", "Sentinel-2 SR (10m resolution)"],
         ["Report Date", generated_on],
@@ -899,11 +993,39 @@ def create_folium_map(center_lat, center_lon, zoom=12):
     return m
 
 
-def add_ee_layer(folium_map, image, vis_params, name, opacity=0.85):
+@st.cache_resource(show_spinner=False, ttl=3600)
+def _cached_tile_url(image_serialized, vis_params_key):
+    """Resolve an XYZ tile URL for a serialized ee.Image, once per (image, vis) pair."""
+    image = ee.Image(ee.deserializer.fromJSON(image_serialized))
+    vis_params = {k: list(v) if isinstance(v, tuple) else v for k, v in vis_params_key}
+    return image.getMapId(vis_params)['tile_fetcher'].url_format
+
+
+def get_ee_tile_url(image, vis_params):
+    """Tile URL for an ee.Image — getMapId is only hit on a cold cache."""
+    vis_params_key = tuple(
+        (k, tuple(v) if isinstance(v, list) else v) for k, v in sorted(vis_params.items())
+    )
+    return _cached_tile_url(image.serialize(), vis_params_key)
+
+
+@st.cache_resource(show_spinner=False)
+def default_map_html():
+    """Render the static Nepal overview map once; it never changes between reruns."""
+    m = folium.Map(
+        location=[NEPAL_CENTER['lat'], NEPAL_CENTER['lon']], zoom_start=NEPAL_CENTER['zoom'],
+        tiles='https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
+        attr='Esri Satellite'
+    )
+    return m.get_root().render()
+
+
+def add_ee_layer(folium_map, image, vis_params, name, opacity=0.85, show=True):
     try:
-        tile_url = image.getMapId(vis_params)['tile_fetcher'].url_format
+        tile_url = get_ee_tile_url(image, vis_params)
         folium.TileLayer(tiles=tile_url, attr='GEE', name=name,
-                         overlay=True, control=True, opacity=opacity).add_to(folium_map)
+                         overlay=True, control=True, opacity=opacity,
+                         show=show).add_to(folium_map)
         return True
     except Exception as e:
         st.warning(f"Could not load layer '{name}': {str(e)}")
@@ -948,40 +1070,39 @@ def display_status_card(ndvi_change_pct):
 # ══════════════════════════════════════════════════════════════════════════════
 # GROQ AI REPORT
 # ══════════════════════════════════════════════════════════════════════════════
-def generate_report_with_groq(api_key, location_name, lat, lon, buffer_km,
-                               year1, year2, start_month, end_month,
-                               mean_ndvi1, mean_ndvi2, ndvi_change_pct,
-                               timeseries_data, carbon_data, trend_data):
-    try:
-        from groq import Groq
-    except ImportError:
-        return None, "groq_not_installed"
-
-    try:
-        client = Groq(api_key=api_key)
-        month_names = {1:"January",2:"February",3:"March",4:"April",5:"May",6:"June",
-                       7:"July",8:"August",9:"September",10:"October",11:"November",12:"December"}
+@st.cache_data(show_spinner=False, ttl=3600)
+def _request_groq_report(_api_key, location_name, lat, lon, buffer_km,
+                         year1, year2, start_month, end_month,
+                         mean_ndvi1, mean_ndvi2, ndvi_change_pct,
+                         timeseries_data, carbon_data, trend_data):
+    """
+    Call Groq and parse the JSON report. Cached on the analysis parameters
+    (the underscore-prefixed API key is excluded from the cache key);
+    exceptions propagate and are therefore never cached.
+    """
+    from groq import Groq
 
-        status = ("CRITICAL" if ndvi_change_pct < -10 else
-                  "WARNING"  if ndvi_change_pct < -5 else
-                  "STABLE"   if ndvi_change_pct < 0 else "HEALTHY")
+    client = Groq(api_key=_api_key)
+    status = ("CRITICAL" if ndvi_change_pct < -10 else
+              "WARNING"  if ndvi_change_pct < -5 else
+              "STABLE"   if ndvi_change_pct < 0 else "HEALTHY")
 
-        trend_str = ""
-        if trend_data:
-            trend_str = "Multi-year NDVI: " + ", ".join([f"{d['year']}:{d['ndvi']}" for d in trend_data])
+    trend_str = ""
+    if trend_data:
+        trend_str = "Multi-year NDVI: " + ", ".join([f"{d['year']}:{d['ndvi']}" for d in trend_data])
 
-        carbon_str = ""
-        if carbon_data:
-            carbon_str = (f"Carbon stock: {carbon_data['co2e_ha']:.0f} tCO2e/ha, "
-                          f"Total: {carbon_data['total_co2e_t']:,.0f} tCO2e")
-            if "co2e_change_t" in carbon_data:
-                carbon_str += f", Change: {carbon_data['co2e_change_t']:+,.0f} tCO2e"
+    carbon_str = ""
+    if carbon_data:
+        carbon_str = (f"Carbon stock: {carbon_data['co2e_ha']:.0f} tCO2e/ha, "
+                      f"Total: {carbon_data['total_co2e_t']:,.0f} tCO2e")
+        if "co2e_change_t" in carbon_data:
+            carbon_str += f", Change: {carbon_data['co2e_change_t']:+,.0f} tCO2e"
 
-        prompt = f"""You are a senior environmental scientist specializing in satellite forest monitoring and carbon MRV in Nepal.
+    prompt = f"""You are a senior environmental scientist specializing in satellite forest monitoring and carbon MRV in Nepal.
 
 ANALYSIS DATA:
 - Location: {location_name} ({lat:.4f}N, {lon:.4f}E)
-- Period: {month_names[start_month]}-{month_names[end_month]}, {year1} vs {year2}
+- Period: {MONTH_NAMES[start_month]}-{MONTH_NAMES[end_month]}, {year1} vs {year2}
 - NDVI {year1}: {mean_ndvi1:.4f if mean_ndvi1 else 'N/A'}
 - NDVI {year2}: {mean_ndvi2:.4f if mean_ndvi2 else 'N/A'}
 - NDVI Change: {ndvi_change_pct:+.2f}%
@@ -1002,14 +1123,37 @@ Return ONLY valid JSON, no markdown, no preamble:
   "next_monitoring_date": "Suggested next review timeframe."
 }}"""
 
-        resp = client.chat.completions.create(
-            model="llama3-70b-8192",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3, max_tokens=1400
+    resp = client.chat.completions.create(
+        model="llama3-70b-8192",
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.3, max_tokens=1400
+    )
+    raw = resp.choices[0].message.content.strip()
+    raw = raw.replace("```json","").replace("```","").strip()
+    return json.loads(raw)
+
+
+def generate_report_with_groq(api_key, location_name, lat, lon, buffer_km,
+                               year1, year2, start_month, end_month,
+                               mean_ndvi1, mean_ndvi2, ndvi_change_pct,
+                               timeseries_data, carbon_data, trend_data):
+    try:
+        from groq import Groq  # noqa: F401
+    except ImportError:
+        return None, "groq_not_installed"
+
+    def quantize(value):
+        # Float noise in the last digits should not miss the cache
+        return round(value, 4) if value is not None else None
+
+    try:
+        report = _request_groq_report(
+            api_key, location_name, quantize(lat), quantize(lon), buffer_km,
+            year1, year2, start_month, end_month,
+            quantize(mean_ndvi1), quantize(mean_ndvi2), quantize(ndvi_change_pct),
+            timeseries_data, carbon_data, trend_data
         )
-        raw = resp.choices[0].message.content.strip()
-        raw = raw.replace("```json","").replace("```","").strip()
-        return json.loads(raw), None
+        return report, None
 
     except json.JSONDecodeError as e:
         return None, f"JSON parse error: {str(e)}"
@@ -1020,8 +1164,6 @@ Return ONLY valid JSON, no markdown, no preamble:
 def render_report_html(report_data, location_name, lat, lon, year1, year2,
                        mean_ndvi1, mean_ndvi2, ndvi_change_pct, buffer_km,
                        start_month, end_month):
-    month_short = {1:"Jan",2:"Feb",3:"Mar",4:"Apr",5:"May",6:"Jun",
-                   7:"Jul",8:"Aug",9:"Sep",10:"Oct",11:"Nov",12:"Dec"}
     risk = report_data.get("risk_level", "MEDIUM")
     risk_colors = {"LOW":"#27AE60","MEDIUM":"#E67E22","HIGH":"#C0392B","CRITICAL":"#922B21"}
     risk_color = risk_colors.get(risk, "#888")
@@ -1038,7 +1180,7 @@ def render_report_html(report_data, location_name, lat, lon, year1, year2,
         </div>
         <div class="report-header-meta">
           <div>Generated: {generated_on}</div>
-          <div>{month_short[start_month]}–{month_short[end_month]} · {year1} vs {year2}</div>
+          <div>{MONTH_SHORT[start_month]}–{MONTH_SHORT[end_month]} · {year1} vs {year2}</div>
           <div style="margin-top:6px;background:rgba(216,243,220,0.15);border:1px solid rgba(216,243,220,0.3);border-radius:4px;padding:3px 8px;display:inline-block;">
             Risk: <strong style="color:{risk_color};">{risk}</strong>
           </div>
@@ -1167,10 +1309,10 @@ def main():
         c1, c2 = st.columns(2)
         with c1:
             start_month = st.selectbox("Start", range(1,13), index=0,
-                                       format_func=lambda x: datetime(2000,x,1).strftime('%b'))
+                                       format_func=MONTH_SHORT.__getitem__)
         with c2:
             end_month   = st.selectbox("End", range(1,13), index=2,
-                                       format_func=lambda x: datetime(2000,x,1).strftime('%b'))
+                                       format_func=MONTH_SHORT.__getitem__)
 
         st.markdown("## 🌿 Forest Type")
         forest_type = st.selectbox(
@@ -1198,36 +1340,71 @@ def main():
         analyze_button = st.button("🔍 Analyse Forest Health", type="primary", use_container_width=True)
 
     # ── Main content ──────────────────────────────────────────────────────────
-    if analyze_button:
+    # Reruns with unchanged parameters (e.g. the PDF button) reuse the last
+    # analysis from session state instead of re-issuing the GEE requests.
+    params_key = (selected_location, lat, lon, buffer_km, year1, year2, start_month, end_month)
+    last_analysis = st.session_state.get('last_analysis')
+    has_cached = last_analysis is not None and last_analysis['key'] == params_key
+
+    if analyze_button or has_cached:
         with st.spinner("🛰️ Fetching satellite data…"):
             try:
-                # AOI — use uploaded boundary or radius buffer
-                if aoi_custom is not None:
-                    aoi = aoi_custom
+                if has_cached:
+                    analysis = last_analysis
                 else:
-                    aoi = create_aoi_from_point(lat, lon, buffer_km)
-                    area_ha = math.pi * buffer_km**2 * 100  # approx ha
-
-                start_date1 = f"{year1}-{start_month:02d}-01"
-                end_date1   = f"{year1}-{end_month:02d}-28"
-                start_date2 = f"{year2}-{start_month:02d}-01"
-                end_date2   = f"{year2}-{end_month:02d}-28"
-
-                prog = st.progress(0, text="Loading Year 1 imagery…")
-                composite1 = get_sentinel_composite(aoi, start_date1, end_date1)
-                prog.progress(20, text="Loading Year 2 imagery…")
-                composite2 = get_sentinel_composite(aoi, start_date2, end_date2)
-                prog.progress(40, text="Computing NDVI…")
-                mean_ndvi1 = compute_mean_ndvi(composite1, aoi)
-                mean_ndvi2 = compute_mean_ndvi(composite2, aoi)
-                prog.progress(55, text="Building time-series…")
-                timeseries = calculate_ndvi_timeseries(aoi, year2, start_month, end_month)
-                prog.progress(70, text="Done!")
-                prog.empty()
-
-                ndvi_change_pct = 0.0
-                if mean_ndvi1 and mean_ndvi2 and mean_ndvi1 != 0:
-                    ndvi_change_pct = ((mean_ndvi2 - mean_ndvi1) / mean_ndvi1) * 100
+                    # AOI — use uploaded boundary or radius buffer
+                    if aoi_custom is not None:
+                        aoi = aoi_custom
+                    else:
+                        aoi = create_aoi_from_point(lat, lon, buffer_km)
+                        area_ha = math.pi * buffer_km**2 * 100  # approx ha
+
+                    start_date1 = f"{year1}-{start_month:02d}-01"
+                    end_date1   = f"{year1}-{end_month:02d}-28"
+                    start_date2 = f"{year2}-{start_month:02d}-01"
+                    end_date2   = f"{year2}-{end_month:02d}-28"
+
+                    prog = st.progress(0, text="Loading imagery…")
+                    # Per-year composites are only rendered as map tiles
+                    composite1 = get_sentinel_composite(aoi, start_date1, end_date1)
+                    composite2 = get_sentinel_composite(aoi, start_date2, end_date2)
+                    prog.progress(20, text="Computing NDVI…")
+                    aoi_key = aoi.serialize()
+                    mean_ndvi1, mean_ndvi2, ndvi_change_pct = cached_ndvi_change(
+                        aoi_key, aoi, year1, year2, start_month, end_month
+                    )
+                    prog.progress(55, text="Building time-series…")
+                    try:
+                        timeseries = cached_ndvi_timeseries(aoi_key, aoi, year2, start_month, end_month)
+                    except Exception as e:
+                        st.warning(f"Monthly time-series unavailable: {str(e)}")
+                        timeseries = None
+                    prog.progress(70, text="Done!")
+                    prog.empty()
+
+                    analysis = {
+                        "key": params_key, "aoi": aoi, "aoi_key": aoi_key, "area_ha": area_ha,
+                        "composite1": composite1, "composite2": composite2,
+                        "mean_ndvi1": mean_ndvi1, "mean_ndvi2": mean_ndvi2,
+                        "ndvi_change_pct": ndvi_change_pct,
+                        "timeseries": timeseries,
+                    }
+                    st.session_state['last_analysis'] = analysis
+
+                aoi, area_ha = analysis["aoi"], analysis["area_ha"]
+                composite1, composite2 = analysis["composite1"], analysis["composite2"]
+                mean_ndvi1, mean_ndvi2 = analysis["mean_ndvi1"], analysis["mean_ndvi2"]
+                ndvi_change_pct = analysis["ndvi_change_pct"]
+                timeseries = analysis["timeseries"]
+                if timeseries is None and has_cached:
+                    # Earlier fetch failed; retry rather than reuse the failure
+                    try:
+                        timeseries = cached_ndvi_timeseries(
+                            analysis["aoi_key"], aoi, year2, start_month, end_month
+                        )
+                        analysis["timeseries"] = timeseries
+                    except Exception as e:
+                        st.warning(f"Monthly time-series unavailable: {str(e)}")
 
                 # ── CARBON ESTIMATE (Feature 4) ──
                 carbon_data = estimate_carbon_stock(
@@ -1255,49 +1432,41 @@ def main():
                 render_carbon_box(carbon_data)
 
                 # ── Maps ──
-                st.markdown('<div class="section-heading">🗺️ NDVI Comparison Maps</div>', unsafe_allow_html=True)
+                st.markdown('<div class="section-heading">🗺️ NDVI Comparison Map</div>', unsafe_allow_html=True)
                 vis_params = get_ndvi_visualization_params()
-                tab1, tab2 = st.tabs([f"📅 {year1}", f"📅 {year2}"])
-                for tab, year, composite in [(tab1, year1, composite1), (tab2, year2, composite2)]:
-                    with tab:
-                        m = create_folium_map(lat, lon, zoom=11)
-                        added = add_ee_layer(m, composite.select('NDVI'), vis_params, f'NDVI {year}')
-                        if aoi_custom is None:
-                            folium.Circle(location=[lat,lon], radius=buffer_km*1000,
-                                          color='#FFD700', fill=False, weight=3).add_to(m)
-                        folium.LayerControl(collapsed=False).add_to(m)
-                        st_folium(m, width=None, height=460, returned_objects=[], use_container_width=True)
-                        if added:
-                            st.markdown(create_ndvi_colorbar(), unsafe_allow_html=True)
+                st.caption(f"Toggle the {year1} / {year2} NDVI layers with the control in the map's top-right corner.")
+                # One map, both years as overlays — switching layers is purely client-side
+                m = create_folium_map(lat, lon, zoom=11)
+                added1 = add_ee_layer(m, composite1.select('NDVI'), vis_params, f'NDVI {year1}', show=False)
+                added2 = add_ee_layer(m, composite2.select('NDVI'), vis_params, f'NDVI {year2}')
+                if aoi_custom is None:
+                    folium.Circle(location=[lat,lon], radius=buffer_km*1000,
+                                  color='#FFD700', fill=False, weight=3).add_to(m)
+                folium.LayerControl(collapsed=False).add_to(m)
+                components.html(m.get_root().render(), height=460)
+                if added1 or added2:
+                    st.markdown(create_ndvi_colorbar(), unsafe_allow_html=True)
 
                 # ── Monthly trend ──
                 st.markdown('<div class="section-heading">📈 Monthly NDVI Trend</div>', unsafe_allow_html=True)
                 if timeseries:
-                    fig = go.Figure()
-                    df_ts = pd.DataFrame(timeseries)
-                    fig.add_trace(go.Scatter(
-                        x=df_ts['month'], y=df_ts['ndvi'], mode='lines+markers',
-                        line=dict(color=ACCENT, width=3),
-                        marker=dict(size=9, color=DARK_GREEN, line=dict(color=WHITE, width=2)),
-                        fill='tozeroy', fillcolor='rgba(64,145,108,0.12)',
-                        name='Monthly NDVI'
-                    ))
-                    fig.update_layout(
-                        title=dict(text=f"Monthly NDVI ({year2}) — {selected_location}",
-                                   font=dict(size=16, color=DARK_GREEN, family="DM Serif Display")),
-                        xaxis_title="Month", yaxis_title="NDVI",
-                        yaxis=dict(range=[0,1]), plot_bgcolor='rgba(0,0,0,0)',
-                        paper_bgcolor='rgba(0,0,0,0)', font=dict(family="DM Sans", size=12),
-                        margin=dict(l=40, r=20, t=50, b=40)
-                    )
+                    months, ndvi_values = zip(*((d['month'], d['ndvi']) for d in timeseries))
+                    fig = create_ndvi_trend_chart(months, ndvi_values, year2, selected_location)
                     st.plotly_chart(fig, use_container_width=True)
 
                 # ── MULTI-YEAR TREND (Feature 3) ──────────────────────────────
                 trend_data = []
                 if run_multiyear:
                     st.markdown('<div class="section-heading">📊 Multi-Year NDVI Trend (2019–Present)</div>', unsafe_allow_html=True)
-                    with st.spinner("Computing annual NDVI for each year… (this takes ~20s)"):
-                        trend_data = build_multiyear_trend(aoi, start_month, end_month, start_year=2019)
+                    if "trend_data" not in analysis:
+                        with st.spinner("Computing annual NDVI for each year… (this takes ~20s)"):
+                            try:
+                                analysis["trend_data"] = cached_multiyear_trend(
+                                    analysis["aoi_key"], aoi, start_month, end_month, start_year=2019
+                                )
+                            except Exception as e:
+                                st.warning(f"Multi-year trend unavailable: {str(e)}")
+                    trend_data = analysis.get("trend_data", [])
 
                     if trend_data and len(trend_data) >= 2:
                         result = create_multiyear_chart(trend_data, selected_location, forest_type)
@@ -1414,12 +1583,7 @@ def main():
 
     else:
         st.info("👈 Configure parameters in the sidebar, then click **Analyse Forest Health**")
-        m = folium.Map(
-            location=[NEPAL_CENTER['lat'], NEPAL_CENTER['lon']], zoom_start=NEPAL_CENTER['zoom'],
-            tiles='https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
-            attr='Esri Satellite'
-        )
-        st_folium(m, width=None, height=460, returned_objects=[], use_container_width=True)
+        components.html(default_map_html(), height=460)
         c1, c2, c3, c4 = st.columns(4)
         for col, icon, title, desc in [
             (c1,"🛰️","Sentinel-2","10m resolution, 5-day revisit, cloud-masked composites for Nepal."),
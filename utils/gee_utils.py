@@ -3,7 +3,49 @@ GEE Utility Functions for Forest Health Monitoring
 Cloud masking and NDVI calculation functions for Sentinel-2 imagery
 """
 
+import math
+from functools import lru_cache
+
 import ee
+import numpy as np
+
+# Fill value for masked pixels when fetching raw arrays
+_NODATA = -9999
+
+# NDVI map styling (red = bare, green = dense); shared, treat as read-only
+NDVI_VIS_PARAMS = {
+    'min': 0,
+    'max': 0.8,
+    'palette': ('#d73027', '#fc8d59', '#fee08b', '#d9ef8b', '#91cf60', '#1a9850')
+}
+
+
+# EE proxies can only be built after ee.Initialize(), so these are lazy
+# singletons rather than module-level constants.
+@lru_cache(maxsize=1)
+def _get_s2():
+    """Sentinel-2 SR Harmonized collection handle."""
+    return ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
+
+
+@lru_cache(maxsize=1)
+def _get_cloud_filter():
+    """Scene-level cloud filter (CLOUDY_PIXEL_PERCENTAGE < 30)."""
+    return ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 30)
+
+
+def _clear_sky_mask(image):
+    """Clear-sky mask from the Sentinel-2 QA60 band (1 = clear)."""
+    # Get the QA60 band which contains cloud mask information
+    qa = image.select('QA60')
+    
+    # Bits 10 and 11 are clouds and cirrus, respectively
+    cloud_bit_mask = 1 << 10
+    cirrus_bit_mask = 1 << 11
+    
+    # Both flags should be set to zero, indicating clear conditions;
+    # a single test on the combined mask is equivalent
+    return qa.bitwiseAnd(cloud_bit_mask | cirrus_bit_mask).eq(0)
 
 
 def mask_s2_clouds(image):
@@ -16,21 +58,15 @@ def mask_s2_clouds(image):
     Returns:
         ee.Image - Cloud-masked image
     """
-    # Get the QA60 band which contains cloud mask information
-    qa = image.select('QA60')
-    
-    # Bits 10 and 11 are clouds and cirrus, respectively
-    cloud_bit_mask = 1 << 10
-    cirrus_bit_mask = 1 << 11
-    
-    # Both flags should be set to zero, indicating clear conditions
-    mask = qa.bitwiseAnd(cloud_bit_mask).eq(0).And(
-        qa.bitwiseAnd(cirrus_bit_mask).eq(0)
-    )
+    mask = _clear_sky_mask(image)
     
     # Also mask pixels with cloud probability > 20% if SCL band available
-    # Return the masked image with proper scaling
-    return image.updateMask(mask).divide(10000).copyProperties(image, ['system:time_start'])
+    # Return the masked image with proper scaling. copyProperties returns an
+    # ee.Element, so cast back; all properties (incl. system:time_start) are
+    # kept so the masked image still carries its acquisition metadata.
+    return ee.Image(
+        image.updateMask(mask).divide(10000).copyProperties(image, image.propertyNames())
+    )
 
 
 def calculate_ndvi(image):
@@ -50,7 +86,28 @@ def calculate_ndvi(image):
     return image.addBands(ndvi)
 
 
-def get_sentinel_composite(aoi, start_date, end_date):
+def mask_and_ndvi(image):
+    """
+    Cloud-mask, scale and add NDVI to a Sentinel-2 image in one step.
+    
+    Equivalent to calculate_ndvi(mask_s2_clouds(image)), but NDVI is a single
+    expression() node, giving a shallower per-image graph for EE to plan.
+    
+    Args:
+        image: ee.Image - Sentinel-2 SR image
+        
+    Returns:
+        ee.Image - Cloud-masked, scaled image with NDVI band added
+    """
+    scaled = image.updateMask(_clear_sky_mask(image)).divide(10000)
+    ndvi = scaled.expression('(NIR - RED) / (NIR + RED)', {
+        'NIR': scaled.select('B8'),
+        'RED': scaled.select('B4'),
+    }).rename('NDVI')
+    return ee.Image(scaled.addBands(ndvi).copyProperties(image, image.propertyNames()))
+
+
+def get_sentinel_composite(aoi, start_date, end_date, method='mosaic'):
     """
     Get cloud-masked Sentinel-2 composite for a given area and date range.
     
@@ -58,95 +115,300 @@ def get_sentinel_composite(aoi, start_date, end_date):
         aoi: ee.Geometry - Area of interest
         start_date: str - Start date in 'YYYY-MM-DD' format
         end_date: str - End date in 'YYYY-MM-DD' format
+        method: str - Compositing method:
+            'mosaic'  - first valid (least cloudy) pixel; fastest, for map previews
+            'quality' - per-pixel greenest observation via qualityMosaic('NDVI')
+            'median'  - pixel-wise median; slowest, for analytical statistics
         
     Returns:
-        ee.Image - Median composite with NDVI band
+        ee.Image - Composite with NDVI band
     """
-    # Load Sentinel-2 SR Harmonized collection
-    collection = (ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
+    # Load Sentinel-2 SR Harmonized collection, cloud-masked with NDVI per image.
+    # mosaic() takes the last image on top, so put the clearest scenes last;
+    # sort on the raw scene metadata, before map() (which preserves order).
+    collection = (_get_s2()
                   .filterBounds(aoi)
                   .filterDate(start_date, end_date)
-                  .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 30))
-                  .map(mask_s2_clouds))
+                  .filter(_get_cloud_filter())
+                  .sort('CLOUDY_PIXEL_PERCENTAGE', False)
+                  .map(mask_and_ndvi))
     
-    # Create median composite
-    composite = collection.median().clip(aoi)
+    if method == 'mosaic':
+        composite = collection.mosaic()
+    elif method == 'quality':
+        composite = collection.qualityMosaic('NDVI')
+    elif method == 'median':
+        composite = collection.median()
+    else:
+        raise ValueError(f"Unknown composite method: {method}")
+    
+    return composite.clip(aoi)
+
+
+def get_two_year_ndvi_means(aoi, year1, year2, start_month, end_month, tile_scale=4):
+    """
+    Build the mean NDVI for the same season window in two years from a
+    single collection scan, without fetching it.
+    
+    Args:
+        aoi: ee.Geometry - Area of interest
+        year1: int - Earlier year
+        year2: int - Later year
+        start_month: int - Season start month (1-12)
+        end_month: int - Season end month (1-12), inclusive up to the 28th
+        tile_scale: int - reduceRegion tileScale, see compute_mean_ndvi_lazy
+        
+    Returns:
+        ee.List - [mean NDVI year1, mean NDVI year2] (null where no data)
+    """
+    windows = ee.Filter.Or(
+        ee.Filter.date(f"{year1}-{start_month:02d}-01", f"{year1}-{end_month:02d}-28"),
+        ee.Filter.date(f"{year2}-{start_month:02d}-01", f"{year2}-{end_month:02d}-28")
+    )
+    collection = (_get_s2()
+                  .filterBounds(aoi)
+                  .filter(windows)
+                  .filter(_get_cloud_filter())
+                  .map(mask_and_ndvi))
     
-    # Calculate NDVI
-    composite_with_ndvi = calculate_ndvi(composite)
+    def year_mean(year):
+        yearly = collection.filter(ee.Filter.calendarRange(year, year, 'year'))
+        # A year with no scenes has no bands to reduce, so yield null server-side
+        return ee.Algorithms.If(
+            yearly.size().gt(0),
+            compute_mean_ndvi_lazy(yearly.median().clip(aoi), aoi, tile_scale),
+            None
+        )
     
-    return composite_with_ndvi
+    return ee.List([year_mean(year1), year_mean(year2)])
 
 
-def compute_mean_ndvi(ndvi_image, aoi):
+def compute_mean_ndvi_lazy(ndvi_image, aoi, tile_scale=4, scale=30):
+    """
+    Build the server-side mean NDVI over a region without fetching it.
+    
+    tileScale trades speed for memory: start at 4 and escalate through
+    8 and 16 if large AOIs still hit "User memory limit exceeded".
+    bestEffort lets EE coarsen the scale instead of failing on maxPixels.
+    
+    Args:
+        ndvi_image: ee.Image - Image with NDVI band
+        aoi: ee.Geometry - Area of interest
+        tile_scale: int - reduceRegion tileScale (1, 2, 4, 8 or 16)
+        scale: int - Reduction scale in metres
+        
+    Returns:
+        ee.ComputedObject - Mean NDVI value (null if no valid pixels)
+    """
+    stats = ndvi_image.select('NDVI').reduceRegion(
+        reducer=ee.Reducer.mean(),
+        geometry=aoi,
+        scale=scale,
+        maxPixels=1e9,
+        tileScale=tile_scale,
+        bestEffort=True
+    )
+    
+    return stats.get('NDVI')
+
+
+def compute_mean_ndvi(ndvi_image, aoi, tile_scale=4, scale=30):
     """
     Compute the mean NDVI value over a region.
     
     Args:
         ndvi_image: ee.Image - Image with NDVI band
         aoi: ee.Geometry - Area of interest
+        tile_scale: int - reduceRegion tileScale (1, 2, 4, 8 or 16)
+        scale: int - Reduction scale in metres
         
     Returns:
         float - Mean NDVI value
     """
+    return compute_mean_ndvi_lazy(ndvi_image, aoi, tile_scale, scale).getInfo()
+
+
+def compute_ndvi_stats(ndvi_image, aoi, scale=30, tile_scale=4):
+    """
+    Compute mean, standard deviation, min and max NDVI in a single pass.
+    
+    The reducers are combined with sharedInputs so EE scans the pixels once.
+    
+    Args:
+        ndvi_image: ee.Image - Image with NDVI band
+        aoi: ee.Geometry - Area of interest
+        scale: int - Reduction scale in metres
+        tile_scale: int - reduceRegion tileScale, see compute_mean_ndvi_lazy
+        
+    Returns:
+        dict - Keys 'NDVI_mean', 'NDVI_stdDev', 'NDVI_min', 'NDVI_max'
+    """
+    reducer = (ee.Reducer.mean()
+               .combine(ee.Reducer.stdDev(), sharedInputs=True)
+               .combine(ee.Reducer.minMax(), sharedInputs=True))
     stats = ndvi_image.select('NDVI').reduceRegion(
-        reducer=ee.Reducer.mean(),
+        reducer=reducer,
         geometry=aoi,
-        scale=30,
-        maxPixels=1e9
+        scale=scale,
+        maxPixels=1e9,
+        tileScale=tile_scale,
+        bestEffort=True
     )
     
-    return stats.get('NDVI').getInfo()
+    return stats.getInfo()
 
 
-def calculate_ndvi_timeseries(aoi, year, start_month=1, end_month=12):
+def compute_ndvi_array(ndvi_image, aoi, scale=30):
+    """
+    Fetch the NDVI pixels over a region as a NumPy array.
+    
+    Intended for small AOIs (roughly buffer_km <= 5 at 30 m), where the
+    raster is a few hundred pixels on a side. Costs two round-trips (the
+    AOI bounds, then computePixels) regardless of how many statistics are
+    then derived locally with NumPy, instead of one reduceRegion per
+    statistic.
+    
+    Args:
+        ndvi_image: ee.Image - Image with NDVI band
+        aoi: ee.Geometry - Area of interest
+        scale: int - Pixel size in metres
+        
+    Returns:
+        numpy.ndarray - 2-D float array of NDVI, NaN outside the AOI / masked
+    """
+    ring = aoi.bounds().coordinates().getInfo()[0]
+    xs = [pt[0] for pt in ring]
+    ys = [pt[1] for pt in ring]
+    west, north = min(xs), max(ys)
+    
+    # EPSG:4326 grid; convert the metre scale to degrees, narrowing the
+    # longitude step by cos(lat) so pixels stay ~scale metres on both axes
+    center_lat = (north + min(ys)) / 2
+    step_y = scale / 111320
+    step_x = step_y / math.cos(math.radians(center_lat))
+    width = max(1, math.ceil((max(xs) - west) / step_x))
+    height = max(1, math.ceil((north - min(ys)) / step_y))
+    
+    pixels = ee.data.computePixels({
+        'expression': ndvi_image.select('NDVI').clip(aoi).unmask(_NODATA),
+        'fileFormat': 'NUMPY_NDARRAY',
+        'grid': {
+            'dimensions': {'width': width, 'height': height},
+            'affineTransform': {
+                'scaleX': step_x, 'shearX': 0, 'translateX': west,
+                'shearY': 0, 'scaleY': -step_y, 'translateY': north,
+            },
+            'crsCode': 'EPSG:4326',
+        },
+    })
+    
+    ndvi = np.asarray(pixels['NDVI'], dtype=np.float64)
+    ndvi[ndvi == _NODATA] = np.nan
+    return ndvi
+
+
+def calculate_ndvi_timeseries(aoi, year, start_month=1, end_month=12, tile_scale=4):
     """
     Calculate monthly NDVI values for trend analysis.
     
+    All months are reduced server-side and fetched in a single getInfo() call.
+    Months without scenes are skipped; EE request errors propagate.
+    
     Args:
         aoi: ee.Geometry - Area of interest
         year: int - Year to analyze
         start_month: int - Starting month (1-12)
         end_month: int - Ending month (1-12)
+        tile_scale: int - reduceRegion tileScale, see compute_mean_ndvi_lazy
         
     Returns:
         list - List of dictionaries with 'month' and 'ndvi' keys
     """
+    def monthly_mean(month):
+        start = ee.Date.fromYMD(year, month, 1)
+        end = start.advance(1, 'month')
+        scenes = (_get_s2()
+                  .filterBounds(aoi)
+                  .filterDate(start, end))
+        strict = scenes.filter(_get_cloud_filter())
+        relaxed = scenes.filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 60))
+        
+        # Monsoon months often leave fewer than 3 clear scenes; fall back to a
+        # looser scene filter (pixels are still cloud-masked) without a round-trip
+        collection = (ee.ImageCollection(ee.Algorithms.If(strict.size().lt(3), relaxed, strict))
+                      .map(mask_and_ndvi))
+        
+        # Empty months have no bands to reduce, so skip them server-side
+        mean_ndvi = ee.Algorithms.If(
+            collection.size().gt(0),
+            compute_mean_ndvi_lazy(collection.median().clip(aoi), aoi, tile_scale),
+            None
+        )
+        return ee.Feature(None, {'month': start.format('YYYY-MM'), 'ndvi': mean_ndvi})
+    
+    months = ee.List.sequence(start_month, end_month)
+    monthly = ee.FeatureCollection(months.map(monthly_mean)).getInfo()
+    
     results = []
+    for feature in monthly['features']:
+        props = feature['properties']
+        # Null NDVI (no scenes / fully masked) drops the property entirely
+        mean_ndvi = props.get('ndvi')
+        if mean_ndvi is not None:
+            results.append({
+                'month': props['month'],
+                'ndvi': round(mean_ndvi, 4)
+            })
     
-    for month in range(start_month, end_month + 1):
-        # Calculate days in month
-        if month == 12:
-            start_date = f"{year}-{month:02d}-01"
-            end_date = f"{year + 1}-01-01"
-        else:
-            start_date = f"{year}-{month:02d}-01"
-            end_date = f"{year}-{month + 1:02d}-01"
+    return results
+
+
+def calculate_ndvi_monthly_climatology(aoi, years, months, tile_scale=4):
+    """
+    Calculate mean NDVI per calendar month pooled across several years.
+    
+    The collection is filtered once with calendarRange on year and month,
+    then grouped by month server-side and fetched in a single getInfo() call.
+    Months without scenes are skipped; EE request errors propagate.
+    
+    Args:
+        aoi: ee.Geometry - Area of interest
+        years: iterable of int - Years to pool (min/max define the range)
+        months: iterable of int - Calendar months to report (1-12)
+        tile_scale: int - reduceRegion tileScale, see compute_mean_ndvi_lazy
         
-        try:
-            # Get composite for this month
-            collection = (ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
-                          .filterBounds(aoi)
-                          .filterDate(start_date, end_date)
-                          .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 30))
-                          .map(mask_s2_clouds))
-            
-            # Check if we have images
-            count = collection.size().getInfo()
-            
-            if count > 0:
-                composite = collection.median().clip(aoi)
-                composite_with_ndvi = calculate_ndvi(composite)
-                mean_ndvi = compute_mean_ndvi(composite_with_ndvi, aoi)
-                
-                if mean_ndvi is not None:
-                    results.append({
-                        'month': f"{year}-{month:02d}",
-                        'ndvi': round(mean_ndvi, 4)
-                    })
-        except Exception as e:
-            # Skip months with no data
-            continue
+    Returns:
+        list - List of dictionaries with 'month' (int) and 'ndvi' keys
+    """
+    years = list(years)
+    months = list(months)
+    collection = (_get_s2()
+                  .filterBounds(aoi)
+                  .filter(ee.Filter.calendarRange(min(years), max(years), 'year'))
+                  .filter(ee.Filter.calendarRange(min(months), max(months), 'month'))
+                  .filter(_get_cloud_filter())
+                  .map(mask_and_ndvi))
+    
+    def monthly_mean(month):
+        monthly = collection.filter(ee.Filter.calendarRange(month, month, 'month'))
+        mean_ndvi = ee.Algorithms.If(
+            monthly.size().gt(0),
+            compute_mean_ndvi_lazy(monthly.median().clip(aoi), aoi, tile_scale),
+            None
+        )
+        return ee.Feature(None, {'month': month, 'ndvi': mean_ndvi})
+    
+    climatology = ee.FeatureCollection(ee.List(months).map(monthly_mean)).getInfo()
+    
+    results = []
+    for feature in climatology['features']:
+        props = feature['properties']
+        mean_ndvi = props.get('ndvi')
+        if mean_ndvi is not None:
+            results.append({
+                'month': int(props['month']),
+                'ndvi': round(mean_ndvi, 4)
+            })
     
     return results
 
@@ -156,16 +418,12 @@ def get_ndvi_visualization_params():
     Get visualization parameters for NDVI display.
     
     Returns:
-        dict - Visualization parameters
+        dict - Visualization parameters (shared; treat as read-only)
     """
-    return {
-        'min': 0,
-        'max': 0.8,
-        'palette': ['#d73027', '#fc8d59', '#fee08b', '#d9ef8b', '#91cf60', '#1a9850']
-    }
+    return NDVI_VIS_PARAMS
 
 
-def create_aoi_from_point(lat, lon, buffer_km=5):
+def create_aoi_from_point(lat, lon, buffer_km=5, shape='circle'):
     """
     Create an Area of Interest from a center point with buffer.
     
@@ -173,10 +431,20 @@ def create_aoi_from_point(lat, lon, buffer_km=5):
         lat: float - Latitude
         lon: float - Longitude
         buffer_km: float - Buffer radius in kilometers
+        shape: str - 'circle' for a true radial buffer, or 'bbox' for the
+            enclosing 4-vertex rectangle (cheaper per-tile intersection tests
+            where radial semantics are not needed)
         
     Returns:
         ee.Geometry - Buffered point geometry
     """
+    if shape == 'bbox':
+        dlat = buffer_km / 111.32
+        dlon = buffer_km / (111.32 * math.cos(math.radians(lat)))
+        return ee.Geometry.Rectangle([lon - dlon, lat - dlat, lon + dlon, lat + dlat])
+    if shape != 'circle':
+        raise ValueError(f"Unknown AOI shape: {shape}")
+    
     point = ee.Geometry.Point([lon, lat])
     # Convert km to meters for buffer
     aoi = point.buffer(buffer_km * 1000)
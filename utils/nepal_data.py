@@ -3,6 +3,10 @@ Nepal Districts Data
 Contains coordinates for all 77 districts of Nepal for easy location selection
 """
 
+import math
+
+import numpy as np
+
 # Nepal center coordinates
 NEPAL_CENTER = {
     'lat': 28.3949,
@@ -118,17 +122,23 @@ COMMUNITY_FORESTS = {
 }
 
 
+# Combined lookup and a precomputed lowercase search index, built once at import
+_ALL_LOCATIONS = {**NEPAL_DISTRICTS, **COMMUNITY_FORESTS}
+_LOWER_INDEX = tuple((name.lower(), name) for name in _ALL_LOCATIONS)
+
+# Column-wise copies of the same locations for vectorised scans
+_COORDS = np.array([[v['lat'], v['lon']] for v in _ALL_LOCATIONS.values()], dtype=np.float32)
+_NAMES = np.array(list(_ALL_LOCATIONS.keys()))
+
+
 def get_all_locations():
     """
     Get all available locations (districts + community forests).
     
     Returns:
-        dict - Combined dictionary of all locations
+        dict - Combined dictionary of all locations (shared; treat as read-only)
     """
-    all_locations = {}
-    all_locations.update(NEPAL_DISTRICTS)
-    all_locations.update(COMMUNITY_FORESTS)
-    return all_locations
+    return _ALL_LOCATIONS
 
 
 def search_location(query):
@@ -141,11 +151,9 @@ def search_location(query):
     Returns:
         list - List of matching location names
     """
-    all_locations = get_all_locations()
     query_lower = query.lower()
-    matches = [name for name in all_locations.keys() 
-               if query_lower in name.lower()]
-    return sorted(matches)
+    return sorted(name for name_lower, name in _LOWER_INDEX
+                  if query_lower in name_lower)
 
 
 def get_location_coords(name):
@@ -158,8 +166,24 @@ def get_location_coords(name):
     Returns:
         tuple - (lat, lon) or None if not found
     """
-    all_locations = get_all_locations()
-    if name in all_locations:
-        loc = all_locations[name]
+    loc = _ALL_LOCATIONS.get(name)
+    if loc is not None:
         return loc['lat'], loc['lon']
     return None
+
+
+def nearest_location(lat, lon):
+    """
+    Find the known location closest to a point.
+    
+    Args:
+        lat: float - Latitude
+        lon: float - Longitude
+        
+    Returns:
+        str - Name of the nearest district or community forest
+    """
+    # Equirectangular distance; scale longitude so degrees are comparable
+    dlat = _COORDS[:, 0] - lat
+    dlon = (_COORDS[:, 1] - lon) * math.cos(math.radians(lat))
+    return str(_NAMES[(dlat * dlat + dlon * dlon).argmin()])